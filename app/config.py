@@ -17,6 +17,12 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_CHAT_MODEL = os.getenv("OLLAMA_CHAT_MODEL", "llama3.1")
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+# Maximum number of texts sent to Ollama /api/embed in a single request.
+OLLAMA_EMBED_BATCH_SIZE = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "64"))
+# Concurrent requests issued against Ollama during ingestion; match your
+# server's OLLAMA_NUM_PARALLEL setting so requests get their own slots
+# instead of queueing.
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
 
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -35,6 +41,34 @@ UB_COLLECTION_NAME = os.getenv("UB_COLLECTION_NAME", "ub_knowledge")
 # Conversation memory settings
 MAX_HISTORY_TURNS = int(os.getenv("MAX_HISTORY_TURNS", "4"))
 
+# Session history storage: Redis when REDIS_URL is set (required for multi-
+# worker deployments), otherwise an in-process dict. Sessions expire after
+# SESSION_TTL_SECONDS of inactivity (sliding window).
+REDIS_URL = os.getenv("REDIS_URL")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "900"))
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Return a shared async Redis client, or None when REDIS_URL is not configured.
+    """
+    global _redis_client
+    if REDIS_URL and _redis_client is None:
+        import redis.asyncio as redis
+
+        _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis_client
+
+
+async def close_redis_client():
+    """Close the shared Redis client if one was created."""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+
 
 def get_openai_client():
     """
@@ -51,3 +85,36 @@ def get_openai_client():
     from openai import OpenAI
 
     return OpenAI(api_key=OPENAI_API_KEY)
+
+
+_async_openai_client = None
+
+
+def get_async_openai_client():
+    """
+    Return a shared async OpenAI client, creating it on first use so every
+    call reuses one connection pool.
+
+    Raises:
+        RuntimeError: if OPENAI_API_KEY is not configured.
+    """
+    global _async_openai_client
+
+    if not OPENAI_API_KEY:
+        raise RuntimeError(
+            "OPENAI_API_KEY is not set. Configure it in your environment or .env file."
+        )
+
+    if _async_openai_client is None:
+        from openai import AsyncOpenAI
+
+        _async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _async_openai_client
+
+
+async def close_async_openai_client():
+    """Close the shared async OpenAI client if one was created."""
+    global _async_openai_client
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+        _async_openai_client = None
@@ -1,19 +1,57 @@
 """FastAPI application exposing the UB RAG chatbot API."""
 
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
 
+import orjson
 import uuid
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.config import MAX_HISTORY_TURNS
-from app.rag_pipeline import generate_answer, list_sources, load_vector_store
+from app.config import (
+    MAX_HISTORY_TURNS,
+    SESSION_TTL_SECONDS,
+    close_async_openai_client,
+    close_redis_client,
+    get_redis_client,
+)
+from app.rag_pipeline import (
+    build_prompt_from_context,
+    chat_completion_stream,
+    clear_caches,
+    close_http_client,
+    embed_query,
+    generate_answer,
+    list_sources,
+    load_vector_store,
+    retrieve_relevant_chunks,
+    semantic_cache_lookup,
+    semantic_cache_store,
+    sources_from_docs,
+    warm_up_llm,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the vector store at startup and release HTTP connections at shutdown."""
+    try:
+        load_vector_store()
+    except Exception as exc:  # pragma: no cover
+        print(f"Warning: Failed to initialize vector store: {exc}")
+    yield
+    await close_http_client()
+    await close_async_openai_client()
+    await close_redis_client()
+
 
 app = FastAPI(
     title="UB RAG Chatbot API",
     description="Retrieval-Augmented Generation chatbot for University at Buffalo.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Allow CORS for local development and embedding on arbitrary domains.
@@ -50,16 +88,40 @@ class ChatResponse(BaseModel):
     sources: List[Source]
 
 
+# Fallback store when Redis is not configured; per-process and single-worker only.
 conversation_store: Dict[str, List[Dict[str, str]]] = {}
 
 
-@app.on_event("startup")
-def startup_event():
-    """Initialize the vector store at application startup."""
-    try:
-        load_vector_store()
-    except Exception as exc:  # pragma: no cover
-        print(f"Warning: Failed to initialize vector store: {exc}")
+async def load_history(session_id: str) -> List[Dict[str, str]]:
+    """Return the stored conversation history for a session."""
+    redis = get_redis_client()
+    if redis is None:
+        return conversation_store.get(session_id, [])
+    raw = await redis.lrange(f"sess:{session_id}", 0, -1)
+    return [orjson.loads(item) for item in raw]
+
+
+async def append_history(
+    session_id: str,
+    messages: List[Dict[str, str]],
+    max_messages: int,
+) -> None:
+    """
+    Append new messages to a session's history, capped at max_messages.
+
+    With Redis, the capped list gets a sliding TTL so idle sessions expire on
+    the server instead of accumulating.
+    """
+    redis = get_redis_client()
+    if redis is None:
+        history = conversation_store.get(session_id, []) + messages
+        conversation_store[session_id] = history[-max_messages:]
+        return
+
+    key = f"sess:{session_id}"
+    await redis.rpush(key, *(orjson.dumps(m) for m in messages))
+    await redis.ltrim(key, -max_messages, -1)
+    await redis.expire(key, SESSION_TTL_SECONDS)
 
 
 @app.get("/health")
@@ -69,7 +131,7 @@ def health_check():
 
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """
     Main chat endpoint for RAG-based UB Bot.
     """
@@ -77,10 +139,10 @@ def chat(request: ChatRequest):
         raise HTTPException(status_code=400, detail="Message cannot be empty.")
 
     session_id = request.session_id or uuid.uuid4().hex
-    history = conversation_store.get(session_id, [])
 
     try:
-        answer, sources = generate_answer(
+        history = await load_history(session_id)
+        answer, sources = await generate_answer(
             user_query=request.message,
             conversation_history=history,
         )
@@ -90,16 +152,18 @@ def chat(request: ChatRequest):
             detail=f"Error generating answer: {exc}",
         ) from exc
 
-    history = history + [
-        {"role": "user", "content": request.message},
-        {"role": "assistant", "content": answer},
-    ]
-
-    max_messages = MAX_HISTORY_TURNS * 2
-    if len(history) > max_messages:
-        history = history[-max_messages:]
-
-    conversation_store[session_id] = history
+    try:
+        await append_history(
+            session_id,
+            [
+                {"role": "user", "content": request.message},
+                {"role": "assistant", "content": answer},
+            ],
+            max_messages=MAX_HISTORY_TURNS * 2,
+        )
+    except Exception as exc:  # pragma: no cover
+        # Losing one history write should not eat an already-generated answer.
+        print(f"Warning: Failed to store conversation history: {exc}")
 
     return ChatResponse(
         session_id=session_id,
@@ -108,6 +172,87 @@ def chat(request: ChatRequest):
     )
 
 
+def _sse_event(payload: Dict) -> bytes:
+    """Format one server-sent event carrying a JSON payload."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat: answer fragments are forwarded as server-sent
+    events while the LLM generates, so the client sees the first tokens
+    immediately instead of waiting for the full answer.
+
+    Events carry {"delta": ...} fragments followed by a final
+    {"done": true, "session_id": ..., "sources": [...]} event.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    session_id = request.session_id or uuid.uuid4().hex
+
+    async def event_stream():
+        try:
+            # Load the chat model in the background while we embed and retrieve.
+            warm_up_llm()
+
+            history = await load_history(session_id)
+
+            query_embedding = await embed_query(request.message)
+
+            # Follow-up answers depend on the conversation so far; only use
+            # the semantic cache for history-free queries.
+            cached = semantic_cache_lookup(query_embedding) if not history else None
+            if cached is not None:
+                answer, sources = cached
+                yield _sse_event({"delta": answer})
+            else:
+                retrieved_docs = await retrieve_relevant_chunks(
+                    request.message, query_embedding=query_embedding
+                )
+                messages = build_prompt_from_context(
+                    user_query=request.message,
+                    retrieved_docs=retrieved_docs,
+                    conversation_history=history,
+                )
+                parts: List[str] = []
+                async for fragment in chat_completion_stream(messages):
+                    parts.append(fragment)
+                    yield _sse_event({"delta": fragment})
+                answer = "".join(parts).strip()
+                sources = sources_from_docs(retrieved_docs)
+                if not history:
+                    semantic_cache_store(query_embedding, answer, sources)
+
+            yield _sse_event(
+                {"done": True, "session_id": session_id, "sources": sources}
+            )
+        except Exception as exc:
+            yield _sse_event({"error": f"Error generating answer: {exc}"})
+            return
+
+        try:
+            await append_history(
+                session_id,
+                [
+                    {"role": "user", "content": request.message},
+                    {"role": "assistant", "content": answer},
+                ],
+                max_messages=MAX_HISTORY_TURNS * 2,
+            )
+        except Exception as exc:  # pragma: no cover
+            print(f"Warning: Failed to store conversation history: {exc}")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/cache/clear")
+def cache_clear():
+    """Debug endpoint: clear the embedding and semantic answer caches."""
+    return {"cleared": clear_caches()}
+
+
 @app.get("/sources")
 def get_sources(limit: int = 20):
     """Return a sample of known documents in the vector store."""
@@ -124,4 +269,14 @@ def get_sources(limit: int = 20):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # Dev entrypoint: uvloop + httptools (bundled with uvicorn[standard])
+    # replace the default selector loop and h11 parser. reload excludes
+    # multiple workers; see the README for the production command.
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        loop="uvloop",
+        http="httptools",
+    )
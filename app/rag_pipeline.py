@@ -1,42 +1,245 @@
 """RAG pipeline for the UB chatbot."""
 
-from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import chromadb
 from chromadb.config import Settings
-import requests
+import httpx
+import numpy as np
+import orjson
 
 from app.config import (
     LLM_PROVIDER,
     OLLAMA_BASE_URL,
     OLLAMA_CHAT_MODEL,
+    OLLAMA_EMBED_BATCH_SIZE,
     OLLAMA_EMBED_MODEL,
     OPENAI_CHAT_MODEL,
     OPENAI_EMBEDDING_MODEL,
     VECTOR_STORE_DIR,
     UB_COLLECTION_NAME,
-    get_openai_client,
+    get_async_openai_client,
 )
 
 # Global Chroma client and collection (lazy-initialized)
 _chroma_client: Optional[chromadb.PersistentClient] = None
 _collection: Optional[Any] = None
 
+# Shared async HTTP client so concurrent requests overlap their network I/O
+# and reuse pooled keep-alive connections (lazy-initialized).
+_aclient: Optional[httpx.AsyncClient] = None
+
+# Request bodies are serialized with orjson (bytes, no str round trip) rather
+# than httpx's stdlib-json `json=` path; notably faster for embedding arrays.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it on first use."""
+    global _aclient
+    if _aclient is None:
+        _aclient = httpx.AsyncClient(
+            http2=True,
+            timeout=300,
+            limits=httpx.Limits(
+                max_keepalive_connections=40,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+        )
+    return _aclient
+
+
+async def close_http_client() -> None:
+    """Close the shared async HTTP client and its pooled connections."""
+    global _aclient
+    if _aclient is not None:
+        await _aclient.aclose()
+        _aclient = None
+
+
+# Exact embedding cache: embeddings are deterministic per (model, text), so
+# repeat queries can skip the embedding API call entirely. LRU-evicted.
+EMBED_CACHE_MAX_ENTRIES = 10000
+_embed_cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+# Semantic answer cache: recent query embeddings (unit-normalized) alongside
+# the full (answer, sources) they produced. A new query whose cosine
+# similarity to a cached one reaches the threshold reuses that answer,
+# skipping both retrieval and the chat completion.
+SEMANTIC_CACHE_MAX_ENTRIES = 256
+SEMANTIC_CACHE_THRESHOLD = 0.97
+_semantic_cache: deque = deque(maxlen=SEMANTIC_CACHE_MAX_ENTRIES)
+
+
+def clear_caches() -> Dict[str, int]:
+    """Clear the embedding and semantic answer caches; return evicted counts."""
+    cleared = {
+        "embedding_cache": len(_embed_cache),
+        "semantic_cache": len(_semantic_cache),
+    }
+    _embed_cache.clear()
+    _semantic_cache.clear()
+    return cleared
+
+
+def _embedding_model_name() -> str:
+    """Return the embedding model name for the configured provider."""
+    if (LLM_PROVIDER or "").lower() == "openai":
+        return OPENAI_EMBEDDING_MODEL
+    return OLLAMA_EMBED_MODEL
+
+
+def _unit_vector(vec: List[float]) -> Optional[np.ndarray]:
+    """Return vec as a unit-normalized float32 array, or None if degenerate."""
+    arr = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    if norm == 0.0 or not np.isfinite(norm):
+        return None
+    return arr / norm
+
+
+def semantic_cache_lookup(
+    query_embedding: List[float],
+) -> Optional[Tuple[str, List[Dict[str, Optional[str]]]]]:
+    """Return a cached (answer, sources) whose query is semantically close enough."""
+    if not _semantic_cache:
+        return None
+
+    q = _unit_vector(query_embedding)
+    if q is None:
+        return None
+
+    entries = list(_semantic_cache)
+    matrix = np.stack([entry[0] for entry in entries])
+    similarities = matrix @ q
+    best = int(np.argmax(similarities))
+    if similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+        _, answer, sources = entries[best]
+        return answer, sources
+    return None
+
+
+def semantic_cache_store(
+    query_embedding: List[float],
+    answer: str,
+    sources: List[Dict[str, Optional[str]]],
+) -> None:
+    """Remember the answer for this query embedding; oldest entries roll off."""
+    q = _unit_vector(query_embedding)
+    if q is not None:
+        _semantic_cache.append((q, answer, sources))
+
+
+async def _ollama_embed_batch(base_url: str, batch: List[str]) -> List[List[float]]:
+    """
+    Embed one batch of texts with a single Ollama /api/embed request.
+
+    If the server rejects the payload as too large or fails with a 5xx error,
+    the batch is halved and each half retried, so oversized batches degrade
+    gracefully instead of failing the whole run.
+    """
+    try:
+        resp = await get_http_client().post(
+            f"{base_url}/api/embed",
+            content=orjson.dumps({"model": OLLAMA_EMBED_MODEL, "input": batch}),
+            headers=_JSON_HEADERS,
+        )
+    except httpx.HTTPError as exc:
+        raise RuntimeError(
+            "Ollama is not running at OLLAMA_BASE_URL; please install Ollama, "
+            "run `ollama serve`, and pull the required models."
+        ) from exc
+
+    if resp.status_code == 413 or resp.status_code >= 500:
+        if len(batch) > 1:
+            mid = len(batch) // 2
+            return await _ollama_embed_batch(
+                base_url, batch[:mid]
+            ) + await _ollama_embed_batch(base_url, batch[mid:])
+
+    if resp.status_code != 200:
+        raise RuntimeError(
+            f"Ollama embeddings request failed with status {resp.status_code}: "
+            f"{resp.text}"
+        )
+
+    data = orjson.loads(resp.content)
+    if "embeddings" in data and data["embeddings"]:
+        # Standard Ollama embed response: {"embeddings": [[...], ...]}
+        vectors = data["embeddings"]
+    elif "embedding" in data:
+        # Fallback: single vector
+        vectors = [data["embedding"]]
+    else:
+        raise RuntimeError(
+            "Unexpected response format from Ollama embeddings API."
+        )
+
+    for vec in vectors:
+        if not isinstance(vec, list) or not vec:
+            raise RuntimeError(
+                "Received empty or invalid embedding vector from Ollama."
+            )
+
+    return vectors
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+
+async def embed_texts(
+    texts: List[str],
+    max_batch: Optional[int] = None,
+) -> List[List[float]]:
     """
     Embed a list of texts using the configured LLM provider.
 
+    Texts already in the embedding cache are served from memory; only cache
+    misses are sent to the provider. For Ollama, misses are submitted in
+    sub-batches of at most ``max_batch`` (default ``OLLAMA_EMBED_BATCH_SIZE``)
+    per HTTP request instead of one request per text.
+
     Returns a list of embedding vectors, one per input text.
     """
     if not texts:
         return []
 
+    model = _embedding_model_name()
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    miss_indices: List[int] = []
+    miss_texts: List[str] = []
+
+    for idx, text in enumerate(texts):
+        cached = _embed_cache.get((model, text))
+        if cached is not None:
+            _embed_cache.move_to_end((model, text))
+            results[idx] = cached
+        else:
+            miss_indices.append(idx)
+            miss_texts.append(text)
+
+    if miss_texts:
+        fresh = await _embed_texts_uncached(miss_texts, max_batch=max_batch)
+        for idx, text, vec in zip(miss_indices, miss_texts, fresh):
+            results[idx] = vec
+            _embed_cache[(model, text)] = vec
+            while len(_embed_cache) > EMBED_CACHE_MAX_ENTRIES:
+                _embed_cache.popitem(last=False)
+
+    return results
+
+
+async def _embed_texts_uncached(
+    texts: List[str],
+    max_batch: Optional[int] = None,
+) -> List[List[float]]:
+    """Embed texts via the configured provider without consulting the cache."""
     provider = (LLM_PROVIDER or "").lower()
 
     if provider == "openai":
-        client = get_openai_client()
-        response = client.embeddings.create(
+        client = get_async_openai_client()
+        response = await client.embeddings.create(
             model=OPENAI_EMBEDDING_MODEL,
             input=texts,
         )
@@ -44,45 +247,15 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
 
     if provider == "ollama":
         base_url = (OLLAMA_BASE_URL or "").rstrip("/")
-        embeddings: List[List[float]] = []
+        batch_size = max_batch if max_batch is not None else OLLAMA_EMBED_BATCH_SIZE
+        if batch_size < 1:
+            batch_size = 1
 
-        for text in texts:
-            try:
-                resp = requests.post(
-                    f"{base_url}/api/embed",
-                    json={"model": OLLAMA_EMBED_MODEL, "input": text},
-                    timeout=60,
-                )
-            except requests.RequestException as exc:
-                raise RuntimeError(
-                    "Ollama is not running at OLLAMA_BASE_URL; please install Ollama, "
-                    "run `ollama serve`, and pull the required models."
-                ) from exc
-
-            if resp.status_code != 200:
-                raise RuntimeError(
-                    f"Ollama embeddings request failed with status {resp.status_code}: "
-                    f"{resp.text}"
-                )
-
-            data = resp.json()
-            if "embeddings" in data and data["embeddings"]:
-                # Standard Ollama embed response: {"embeddings": [[...]]}
-                vec = data["embeddings"][0]
-            elif "embedding" in data:
-                # Fallback: single vector
-                vec = data["embedding"]
-            else:
-                raise RuntimeError(
-                    "Unexpected response format from Ollama embeddings API."
-                )
-
-            if not isinstance(vec, list) or not vec:
-                raise RuntimeError(
-                    "Received empty or invalid embedding vector from Ollama."
-                )
-
-            embeddings.append(vec)
+        embeddings: List[List[float]] = []
+        for i in range(0, len(texts), batch_size):
+            embeddings.extend(
+                await _ollama_embed_batch(base_url, texts[i : i + batch_size])
+            )
 
         if len(embeddings) != len(texts):
             raise RuntimeError(
@@ -95,15 +268,146 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     raise RuntimeError(f"Unsupported LLM_PROVIDER: {LLM_PROVIDER}")
 
 
-def chat_completion(messages: List[Dict[str, str]]) -> str:
+# Stable system prompt, hoisted to module level: sending the identical prefix
+# on every call is what lets the LLM reuse its prompt/KV cache across turns.
+SYSTEM_PROMPT = (
+    "You are UB Bot, a helpful, friendly assistant for the University at Buffalo (UB). "
+    "You answer questions for prospective and current students about UB programs, admissions, "
+    "housing, campus life, and related topics.\n\n"
+    "Use ONLY the context passages provided to you plus obvious, generic admissions knowledge. "
+    "Be as clear and concrete as possible in your answers.\n\n"
+    "Rules:\n"
+    "- Give a direct, helpful answer. Do not just tell the user to 'check the website' or 'contact support'.\n"
+    "- When the user asks about applying or the process to apply (for example, 'how do I apply', "
+    "'what is the process', or 'I want to take admission'), respond with a short, step-by-step list of the "
+    "main steps in the process based on the context and general admissions flow "
+    "(review requirements, prepare documents, submit online application, pay fee, track status, etc.).\n"
+    "- Do NOT invent specific numbers that are not in the context (no specific GPA cutoffs, deadlines, fees, "
+    "or dollar amounts unless they appear in the context).\n"
+    "- Do NOT mention or reference 'Source 1', 'Source 2', file names, or .txt documents in your answer. "
+    "Just answer as if you know the information.\n"
+    "- Keep your tone supportive and student-friendly. You can use bullet points or numbered lists when "
+    "describing steps.\n"
+    "- Only if important details are clearly missing, add ONE short line at the very end like: "
+    "\"For the latest official requirements and deadlines, please confirm on UB’s official website.\""
+)
+
+
+def _ollama_chat_payload(
+    messages: List[Dict[str, str]],
+    stream: bool,
+) -> Dict[str, Any]:
+    """
+    Build the Ollama /api/chat payload.
+
+    The system prompt stays as the leading chat message: /api/chat has no
+    top-level system parameter, and the chat template renders a leading
+    system message into the same (KV-cacheable) prompt prefix anyway.
+    keep_alive holds the model resident between turns of a conversation.
+    """
+    return {
+        "model": OLLAMA_CHAT_MODEL,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": "30m",
+    }
+
+
+# LLM warm-up: while retrieval runs, ask Ollama to (re)load the chat model
+# with a generous keep_alive so prefill can start the moment the prompt is
+# ready, instead of paying a model load after retrieval finishes.
+WARMUP_INTERVAL_SECONDS = 60
+_last_warmup = 0.0
+_warmup_task: Optional["asyncio.Task[None]"] = None
+
+
+def warm_up_llm() -> None:
+    """Fire an opportunistic background request to keep the chat model loaded."""
+    global _last_warmup, _warmup_task
+
+    if (LLM_PROVIDER or "").lower() != "ollama":
+        return
+    if time.monotonic() - _last_warmup < WARMUP_INTERVAL_SECONDS:
+        return
+
+    _last_warmup = time.monotonic()
+    _warmup_task = asyncio.create_task(_warm_up_llm())
+
+
+async def _warm_up_llm() -> None:
+    base_url = (OLLAMA_BASE_URL or "").rstrip("/")
+    try:
+        await get_http_client().post(
+            f"{base_url}/api/generate",
+            content=orjson.dumps({"model": OLLAMA_CHAT_MODEL, "keep_alive": "30m"}),
+            headers=_JSON_HEADERS,
+        )
+    except httpx.HTTPError:
+        # Warm-up is purely opportunistic; the real chat call reports errors.
+        pass
+
+
+# Query embedding micro-batching: concurrent /chat requests that arrive
+# within this window share a single embedding request instead of paying one
+# HTTP round trip each.
+QUERY_BATCH_WINDOW_SECONDS = 0.02
+_pending_queries: List[Tuple[str, "asyncio.Future[List[float]]"]] = []
+_flush_task: Optional["asyncio.Task[None]"] = None
+
+
+async def embed_query(text: str) -> List[float]:
+    """
+    Embed one query, coalescing with other queries arriving within
+    QUERY_BATCH_WINDOW_SECONDS into a single embed_texts call.
+    """
+    global _flush_task
+
+    loop = asyncio.get_running_loop()
+    future: "asyncio.Future[List[float]]" = loop.create_future()
+    _pending_queries.append((text, future))
+
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_pending_queries())
+
+    return await future
+
+
+async def _flush_pending_queries() -> None:
+    """Wait out the batching window, then embed all pending queries at once."""
+    global _flush_task
+
+    await asyncio.sleep(QUERY_BATCH_WINDOW_SECONDS)
+
+    pending = _pending_queries[:]
+    del _pending_queries[: len(pending)]
+
+    if pending:
+        try:
+            vectors = await embed_texts([text for text, _ in pending])
+        except Exception as exc:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for (_, future), vector in zip(pending, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    # Queries that arrived while we were embedding saw a not-yet-done flush
+    # task and did not schedule a new one; pick them up here.
+    if _pending_queries:
+        _flush_task = asyncio.create_task(_flush_pending_queries())
+
+
+async def chat_completion(messages: List[Dict[str, str]]) -> str:
     """
     Run a chat completion using the configured LLM provider and return the text.
     """
     provider = (LLM_PROVIDER or "").lower()
 
     if provider == "openai":
-        client = get_openai_client()
-        completion = client.chat.completions.create(
+        client = get_async_openai_client()
+        completion = await client.chat.completions.create(
             model=OPENAI_CHAT_MODEL,
             messages=messages,
             temperature=0.2,
@@ -113,17 +417,12 @@ def chat_completion(messages: List[Dict[str, str]]) -> str:
     if provider == "ollama":
         base_url = (OLLAMA_BASE_URL or "").rstrip("/")
         try:
-            resp = requests.post(
+            resp = await get_http_client().post(
                 f"{base_url}/api/chat",
-                json={
-                    "model": OLLAMA_CHAT_MODEL,
-                    "messages": messages,
-                    # Ensure a single JSON response instead of a streaming payload.
-                    "stream": False,
-                },
-                timeout=300,
+                content=orjson.dumps(_ollama_chat_payload(messages, stream=False)),
+                headers=_JSON_HEADERS,
             )
-        except requests.RequestException as exc:
+        except httpx.HTTPError as exc:
             raise RuntimeError(
                 "Ollama is not running at OLLAMA_BASE_URL; please install Ollama, "
                 "run `ollama serve`, and pull the required models."
@@ -135,7 +434,7 @@ def chat_completion(messages: List[Dict[str, str]]) -> str:
                 f"{resp.text}"
             )
 
-        data = resp.json()
+        data = orjson.loads(resp.content)
 
         # Standard Ollama chat format: {"message": {"role": "assistant", "content": "..."}}
         if "message" in data and isinstance(data["message"], dict):
@@ -156,6 +455,80 @@ def chat_completion(messages: List[Dict[str, str]]) -> str:
     raise RuntimeError(f"Unsupported LLM_PROVIDER: {LLM_PROVIDER}")
 
 
+async def chat_completion_stream(
+    messages: List[Dict[str, str]],
+) -> AsyncIterator[str]:
+    """
+    Run a chat completion and yield the answer text incrementally as it is
+    generated, instead of waiting for the full response.
+    """
+    provider = (LLM_PROVIDER or "").lower()
+
+    if provider == "openai":
+        client = get_async_openai_client()
+        stream = await client.chat.completions.create(
+            model=OPENAI_CHAT_MODEL,
+            messages=messages,
+            temperature=0.2,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        return
+
+    if provider == "ollama":
+        base_url = (OLLAMA_BASE_URL or "").rstrip("/")
+        try:
+            async with get_http_client().stream(
+                "POST",
+                f"{base_url}/api/chat",
+                content=orjson.dumps(_ollama_chat_payload(messages, stream=True)),
+                headers=_JSON_HEADERS,
+            ) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    raise RuntimeError(
+                        f"Ollama chat request failed with status {resp.status_code}: "
+                        f"{body}"
+                    )
+
+                # Ollama streams newline-delimited JSON objects.
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = orjson.loads(line)
+                    message = data.get("message") or {}
+                    content = message.get("content")
+                    if content:
+                        yield content
+                    if data.get("done"):
+                        break
+        except httpx.HTTPError as exc:
+            raise RuntimeError(
+                "Ollama is not running at OLLAMA_BASE_URL; please install Ollama, "
+                "run `ollama serve`, and pull the required models."
+            ) from exc
+        return
+
+    raise RuntimeError(f"Unsupported LLM_PROVIDER: {LLM_PROVIDER}")
+
+
+# Collection settings shared with ingestion. Cosine space matches the
+# normalized embedding models we use, and the tuned HNSW parameters trade a
+# little index build time for faster, more accurate search. They only take
+# effect when the collection is created, so changing them requires re-ingest.
+UB_COLLECTION_METADATA = {
+    "description": "UB website and document content",
+    "hnsw:space": "cosine",
+    "hnsw:M": 96,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 100,
+}
+
+
 def load_vector_store():
     """
     Initialize and return the Chroma collection for UB documents.
@@ -173,12 +546,17 @@ def load_vector_store():
     if _collection is None:
         _collection = _chroma_client.get_or_create_collection(
             name=UB_COLLECTION_NAME,
-            metadata={"description": "UB website and document content"},
+            metadata=UB_COLLECTION_METADATA,
         )
 
     return _collection
 
 
+# Cosine-distance cutoff for retrieved context (assumes the cosine-space
+# collection from UB_COLLECTION_METADATA): chunks farther than this from the
+# query add prompt tokens without adding signal.
+MAX_CONTEXT_DISTANCE = 0.8
+
 FACULTY_KEYWORDS = [
     "faculty",
     "professor",
@@ -190,16 +568,19 @@ FACULTY_KEYWORDS = [
 ]
 
 
-def retrieve_relevant_chunks(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+async def retrieve_relevant_chunks(
+    query: str,
+    top_k: int = 10,
+    query_embedding: Optional[List[float]] = None,
+) -> List[Dict[str, Any]]:
     """
-    Embed the user query, search the vector store, and return the top-k chunks.
+    Embed the user query (unless an embedding is supplied), search the vector
+    store, and return the top-k chunks.
     """
     collection = load_vector_store()
 
-    query_embeddings = embed_texts([query])
-    if not query_embeddings:
-        return []
-    query_embedding = query_embeddings[0]
+    if query_embedding is None:
+        query_embedding = await embed_query(query)
 
     results = collection.query(
         query_embeddings=[query_embedding],
@@ -217,13 +598,24 @@ def retrieve_relevant_chunks(query: str, top_k: int = 10) -> List[Dict[str, Any]
     is_faculty_query = any(word in q_lower for word in FACULTY_KEYWORDS)
 
     matched_docs: List[Dict[str, Any]] = []
+    seen_ids = set()
     for idx, doc_id in enumerate(ids):
+        # Skip duplicates and chunks too dissimilar to be useful context;
+        # every chunk kept here costs prompt tokens on the chat call.
+        if doc_id in seen_ids:
+            continue
+        seen_ids.add(doc_id)
+
+        distance = distances[idx]
+        if distance is not None and distance > MAX_CONTEXT_DISTANCE:
+            continue
+
         matched_docs.append(
             {
                 "id": doc_id,
                 "content": docs[idx],
                 "metadata": metadatas[idx] or {},
-                "distance": distances[idx],
+                "distance": distance,
             }
         )
 
@@ -248,6 +640,33 @@ def retrieve_relevant_chunks(query: str, top_k: int = 10) -> List[Dict[str, Any]
     return matched_docs
 
 
+# History compaction: the most recent turns stay verbatim; anything older is
+# folded into one short system note so prompt size stays bounded as a chat
+# grows instead of scaling linearly with its length.
+RECENT_HISTORY_MESSAGES = 6
+HISTORY_SNIPPET_CHARS = 200
+
+
+def _compact_history(
+    conversation_history: List[Dict[str, str]],
+) -> List[Dict[str, str]]:
+    """Return history with messages older than the recent window condensed."""
+    if len(conversation_history) <= RECENT_HISTORY_MESSAGES:
+        return list(conversation_history)
+
+    recent = conversation_history[-RECENT_HISTORY_MESSAGES:]
+    older = conversation_history[:-RECENT_HISTORY_MESSAGES]
+
+    lines = ["Condensed summary of earlier conversation:"]
+    for message in older:
+        snippet = (message.get("content") or "").strip()
+        if len(snippet) > HISTORY_SNIPPET_CHARS:
+            snippet = snippet[:HISTORY_SNIPPET_CHARS].rstrip() + "…"
+        lines.append(f"- {message.get('role', 'user')}: {snippet}")
+
+    return [{"role": "system", "content": "\n".join(lines)}] + list(recent)
+
+
 def build_prompt_from_context(
     user_query: str,
     retrieved_docs: List[Dict[str, Any]],
@@ -256,28 +675,6 @@ def build_prompt_from_context(
     """
     Build chat messages for the chat completion API using context and optional history.
     """
-    system_prompt = (
-        "You are UB Bot, a helpful, friendly assistant for the University at Buffalo (UB). "
-        "You answer questions for prospective and current students about UB programs, admissions, "
-        "housing, campus life, and related topics.\n\n"
-        "Use ONLY the context passages provided to you plus obvious, generic admissions knowledge. "
-        "Be as clear and concrete as possible in your answers.\n\n"
-        "Rules:\n"
-        "- Give a direct, helpful answer. Do not just tell the user to 'check the website' or 'contact support'.\n"
-        "- When the user asks about applying or the process to apply (for example, 'how do I apply', "
-        "'what is the process', or 'I want to take admission'), respond with a short, step-by-step list of the "
-        "main steps in the process based on the context and general admissions flow "
-        "(review requirements, prepare documents, submit online application, pay fee, track status, etc.).\n"
-        "- Do NOT invent specific numbers that are not in the context (no specific GPA cutoffs, deadlines, fees, "
-        "or dollar amounts unless they appear in the context).\n"
-        "- Do NOT mention or reference 'Source 1', 'Source 2', file names, or .txt documents in your answer. "
-        "Just answer as if you know the information.\n"
-        "- Keep your tone supportive and student-friendly. You can use bullet points or numbered lists when "
-        "describing steps.\n"
-        "- Only if important details are clearly missing, add ONE short line at the very end like: "
-        "\"For the latest official requirements and deadlines, please confirm on UB’s official website.\""
-    )
-
     if retrieved_docs:
         context_lines: List[str] = [
             "Here are context passages from University at Buffalo information. Use them when answering the question."
@@ -304,14 +701,14 @@ def build_prompt_from_context(
         )
 
     messages: List[Dict[str, str]] = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": SYSTEM_PROMPT},
     ]
 
     if retrieved_docs:
         messages.append({"role": "user", "content": context_text})
 
     if conversation_history:
-        messages.extend(conversation_history)
+        messages.extend(_compact_history(conversation_history))
 
     user_message_content = (
         "User question:\n"
@@ -326,32 +723,60 @@ def build_prompt_from_context(
     return messages
 
 
-def generate_answer(
+def sources_from_docs(
+    retrieved_docs: List[Dict[str, Any]],
+) -> List[Dict[str, Optional[str]]]:
+    """Extract the source descriptors (file, title, url) from retrieved chunks."""
+    sources: List[Dict[str, Optional[str]]] = []
+    for doc in retrieved_docs:
+        meta = doc.get("metadata", {}) or {}
+        sources.append(
+            {
+                "source_file": meta.get("source_file"),
+                "title": meta.get("title"),
+                "url": meta.get("url"),
+            }
+        )
+    return sources
+
+
+async def generate_answer(
     user_query: str,
     conversation_history: Optional[List[Dict[str, str]]] = None,
     top_k: int = 10,
 ) -> Tuple[str, List[Dict[str, Optional[str]]]]:
     """
     Full RAG pipeline: retrieve, build prompt, call the configured LLM, return answer + sources.
+
+    Answers for semantically near-identical recent queries are served from the
+    semantic cache without re-running retrieval or the chat completion.
     """
-    retrieved_docs = retrieve_relevant_chunks(user_query, top_k=top_k)
+    # Load the chat model in the background while we embed and retrieve.
+    warm_up_llm()
+
+    query_embedding = await embed_query(user_query)
+
+    # Answers to follow-ups depend on the conversation so far; only serve
+    # (and populate) the semantic cache for history-free queries.
+    if not conversation_history:
+        cached = semantic_cache_lookup(query_embedding)
+        if cached is not None:
+            return cached
+
+    retrieved_docs = await retrieve_relevant_chunks(
+        user_query, top_k=top_k, query_embedding=query_embedding
+    )
     messages = build_prompt_from_context(
         user_query=user_query,
         retrieved_docs=retrieved_docs,
         conversation_history=conversation_history,
     )
-    answer = chat_completion(messages)
+    answer = await chat_completion(messages)
 
-    sources: List[Dict[str, Optional[str]]] = []
-    for doc in retrieved_docs:
-        meta = doc.get("metadata", {}) or {}
-        sources.append(
-            {
-                "source_file": meta.get("source_file"),
-                "title": meta.get("title"),
-                "url": meta.get("url"),
-            }
-        )
+    sources = sources_from_docs(retrieved_docs)
+
+    if not conversation_history:
+        semantic_cache_store(query_embedding, answer, sources)
 
     return answer, sources
 
@@ -1,9 +1,17 @@
 """Ingest UB content files into a local Chroma vector store."""
 
+import asyncio
+import hashlib
 import os
+import re
+import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from dotenv import load_dotenv
 
@@ -13,14 +21,23 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
 from app.config import (  # noqa: E402
+    BASE_DIR,
     LLM_PROVIDER,
     OLLAMA_BASE_URL,
+    OLLAMA_EMBED_BATCH_SIZE,
+    OLLAMA_EMBED_MODEL,
+    OLLAMA_NUM_PARALLEL,
     OPENAI_API_KEY,
+    OPENAI_EMBEDDING_MODEL,
     UB_COLLECTION_NAME,
     UB_DATA_DIR,
     VECTOR_STORE_DIR,
 )
-from app.rag_pipeline import embed_texts  # noqa: E402
+from app.rag_pipeline import (  # noqa: E402
+    UB_COLLECTION_METADATA,
+    close_http_client,
+    embed_texts,
+)
 import chromadb  # noqa: E402
 from chromadb.config import Settings  # noqa: E402
 
@@ -37,34 +54,37 @@ def iter_text_files(base_dir: Path) -> List[Path]:
     ]
 
 
+# First non-blank line of a document: either a Markdown heading or plain text.
+TITLE_RE = re.compile(
+    r"^[ \t]*(?:#+[ \t]*(?P<heading>.*?)|(?P<line>[^#\s].*?))[ \t\r]*$",
+    re.MULTILINE,
+)
+
+
 def extract_title_and_body(text: str) -> Tuple[str, str]:
     """
     Extract a title and body from a document.
 
     For Markdown, uses the first '# heading' as title; otherwise, the first
-    non-empty line becomes the title.
+    non-empty line becomes the title. A single precompiled regex scan finds
+    the title line instead of looping over every line in Python.
     """
-    lines = [line.strip() for line in text.splitlines()]
-    title = "Untitled"
-    body_lines: List[str] = []
-
-    found_title = False
-    for line in lines:
-        if not found_title:
-            if line.startswith("#"):
-                title = line.lstrip("#").strip() or "Untitled"
-                found_title = True
-                continue
-            if line:
-                title = line
-                found_title = True
-                continue
-        body_lines.append(line)
-
-    body = "\n".join(body_lines).strip()
+    match = TITLE_RE.search(text)
+    if match is None:
+        return "Untitled", text
+
+    if match.group("heading") is not None:
+        title = match.group("heading").strip() or "Untitled"
+    else:
+        title = match.group("line")
+
+    body = text[match.end() :].strip()
     return title, body or text
 
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
 def split_text_into_chunks(
     text: str,
     chunk_size: int = 1000,
@@ -72,33 +92,243 @@ def split_text_into_chunks(
 ) -> List[str]:
     """Simple character-level text splitter for retrieval chunks.
 
-    Ensures progress even for short texts so we do not get stuck in a loop
-    when applying overlap.
+    Whitespace is collapsed once up front, so the chunking itself is a
+    single O(N) pass of fixed-step slices with no per-chunk stripping.
     """
-    text = text.strip()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
     if not text:
         return []
 
-    chunks: List[str] = []
-    start = 0
-    length = len(text)
+    # Step forward by chunk_size - overlap, guarding against a non-positive
+    # step so short or degenerate arguments cannot loop forever.
+    step = chunk_size - overlap
+    if step < 1:
+        step = chunk_size
 
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunk = text[start:end]
-        chunks.append(chunk.strip())
-        if end >= length:
+    length = len(text)
+    chunks: List[str] = []
+    for start in range(0, length, step):
+        chunks.append(text[start : start + chunk_size])
+        if start + chunk_size >= length:
             break
-        # Move start forward with overlap but never backwards or stuck.
-        next_start = end - overlap
-        if next_start <= start:
-            start = end
-        else:
-            start = max(0, next_start)
 
     return chunks
 
 
+def process_file(
+    file_path: Path,
+    data_dir: Path,
+) -> Tuple[List[str], List[str], List[Dict[str, str]]]:
+    """
+    Read, title-extract and chunk one file.
+
+    Top-level so it can run in worker processes; returns (ids, texts,
+    metadatas) for the file's chunks.
+    """
+    rel_path = file_path.relative_to(data_dir)
+    with file_path.open("r", encoding="utf-8", errors="ignore") as f:
+        raw_text = f.read()
+
+    title, body = extract_title_and_body(raw_text)
+    chunks = split_text_into_chunks(body)
+
+    ids: List[str] = []
+    texts: List[str] = []
+    metadatas: List[Dict[str, str]] = []
+    for idx, chunk in enumerate(chunks):
+        ids.append(f"{rel_path.as_posix()}::chunk-{idx}")
+        texts.append(chunk)
+        metadatas.append(
+            {
+                "source_file": rel_path.as_posix(),
+                "title": title,
+                # Store URL as empty string if unknown to avoid None in Chroma metadata.
+                "url": "",
+            }
+        )
+    return ids, texts, metadatas
+
+
+# On-disk embedding cache so re-ingesting unchanged content skips the
+# embedding API entirely; keyed by sha256(model + chunk text).
+EMBED_CACHE_PATH = BASE_DIR / "embed_cache.db"
+
+
+def open_embed_cache() -> sqlite3.Connection:
+    """Open (creating if needed) the persistent embedding cache."""
+    conn = sqlite3.connect(EMBED_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)"
+    )
+    return conn
+
+
+def chunk_hash(model: str, text: str) -> str:
+    """Cache key for one chunk: content hash scoped to the embedding model."""
+    return hashlib.sha256((model + text).encode("utf-8")).hexdigest()
+
+
+def cache_lookup(
+    conn: sqlite3.Connection, hashes: List[str]
+) -> Dict[str, List[float]]:
+    """Return cached vectors for the given hashes (missing ones are absent)."""
+    found: Dict[str, List[float]] = {}
+    placeholders = ",".join("?" * len(hashes))
+    rows = conn.execute(
+        f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})",
+        hashes,
+    )
+    for key, blob in rows:
+        found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+    return found
+
+
+def cache_store(
+    conn: sqlite3.Connection,
+    hashes: List[str],
+    vectors: List[List[float]],
+) -> None:
+    """Persist freshly computed vectors as float32 blobs."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+        [
+            (key, np.asarray(vec, dtype=np.float32).tobytes())
+            for key, vec in zip(hashes, vectors)
+        ],
+    )
+    conn.commit()
+
+
+# Ollama batches follow OLLAMA_EMBED_BATCH_SIZE from config. OpenAI accepts
+# very large array inputs, so pack its batches up to a text count and
+# estimated token budget.
+OPENAI_MAX_BATCH_TEXTS = 512
+OPENAI_MAX_BATCH_TOKENS = 250_000
+MAX_EMBED_RETRIES = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def build_batch_ranges(texts: List[str], provider: str) -> List[Tuple[int, int]]:
+    """
+    Split texts into contiguous (start, end) batch ranges.
+
+    Ollama gets fixed batches of OLLAMA_EMBED_BATCH_SIZE; OpenAI gets batches
+    packed up to OPENAI_MAX_BATCH_TEXTS texts or OPENAI_MAX_BATCH_TOKENS
+    estimated tokens, whichever fills first, to stay under the API's
+    per-request token limit.
+    """
+    if provider != "openai":
+        return [
+            (i, min(i + OLLAMA_EMBED_BATCH_SIZE, len(texts)))
+            for i in range(0, len(texts), OLLAMA_EMBED_BATCH_SIZE)
+        ]
+
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for idx, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        full = idx - start >= OPENAI_MAX_BATCH_TEXTS or (
+            idx > start and tokens + cost > OPENAI_MAX_BATCH_TOKENS
+        )
+        if full:
+            ranges.append((start, idx))
+            start = idx
+            tokens = 0
+        tokens += cost
+    if start < len(texts):
+        ranges.append((start, len(texts)))
+    return ranges
+
+
+async def embed_openai_with_retries(batch: List[str]) -> List[List[float]]:
+    """
+    Embed one OpenAI batch, retrying rate limits with exponential backoff and
+    splitting batches the API rejects for exceeding its token limit.
+    """
+    from openai import BadRequestError, RateLimitError
+
+    delay = 1.0
+    for attempt in range(MAX_EMBED_RETRIES):
+        try:
+            return await embed_texts(batch)
+        except RateLimitError:
+            if attempt == MAX_EMBED_RETRIES - 1:
+                raise
+            await asyncio.sleep(delay)
+            delay *= 2
+        except BadRequestError as exc:
+            if len(batch) > 1 and "token" in str(exc).lower():
+                mid = len(batch) // 2
+                return await embed_openai_with_retries(
+                    batch[:mid]
+                ) + await embed_openai_with_retries(batch[mid:])
+            raise
+    raise RuntimeError("embed_openai_with_retries: retries exhausted")
+
+
+async def embed_batches(
+    batches: List[List[str]],
+    provider: str,
+    cache_conn: sqlite3.Connection,
+    max_concurrency: Optional[int] = None,
+) -> List[List[List[float]]]:
+    """
+    Embed all batches concurrently, bounded by a semaphore (default
+    OLLAMA_NUM_PARALLEL) so a local Ollama instance gets one request per
+    parallel slot instead of a flood it would queue anyway.
+
+    Chunks whose (model, text) hash is already in the persistent cache are
+    served from disk; only misses are sent to the embedding API.
+    """
+    if max_concurrency is None:
+        max_concurrency = OLLAMA_NUM_PARALLEL
+    semaphore = asyncio.Semaphore(max_concurrency)
+    model = OPENAI_EMBEDDING_MODEL if provider == "openai" else OLLAMA_EMBED_MODEL
+    hits = 0
+    misses = 0
+
+    async def embed_one(batch: List[str]) -> List[List[float]]:
+        nonlocal hits, misses
+
+        hashes = [chunk_hash(model, text) for text in batch]
+        cached = cache_lookup(cache_conn, hashes)
+        results: List[List[float]] = [cached.get(key) for key in hashes]
+
+        miss_indices = [idx for idx, vec in enumerate(results) if vec is None]
+        hits += len(batch) - len(miss_indices)
+        misses += len(miss_indices)
+
+        if miss_indices:
+            miss_texts = [batch[idx] for idx in miss_indices]
+            async with semaphore:
+                if provider == "openai":
+                    fresh = await embed_openai_with_retries(miss_texts)
+                else:
+                    fresh = await embed_texts(miss_texts)
+            cache_store(
+                cache_conn,
+                [hashes[idx] for idx in miss_indices],
+                fresh,
+            )
+            for idx, vec in zip(miss_indices, fresh):
+                results[idx] = vec
+
+        return results
+
+    try:
+        embeddings = await asyncio.gather(*(embed_one(batch) for batch in batches))
+    finally:
+        await close_http_client()
+
+    print(f"Embedding cache: {hits} hits, {misses} misses.")
+    return embeddings
+
+
 def main():
     """Main ingestion routine."""
 
@@ -130,7 +360,7 @@ def main():
     )
     collection = chroma_client.get_or_create_collection(
         name=UB_COLLECTION_NAME,
-        metadata={"description": "UB website and document content"},
+        metadata=UB_COLLECTION_METADATA,
     )
 
     files = iter_text_files(data_dir)
@@ -147,27 +377,36 @@ def main():
     all_texts: List[str] = []
     all_metadatas: List[Dict[str, str]] = []
 
-    for file_path in files:
-        rel_path = file_path.relative_to(data_dir)
-        with file_path.open("r", encoding="utf-8", errors="ignore") as f:
-            raw_text = f.read()
-
-        title, body = extract_title_and_body(raw_text)
-        chunks = split_text_into_chunks(body)
-        if not chunks:
+    # Parsing and chunking are pure Python string work; spread them across
+    # cores so large corpora do not serialize on the main process.
+    with ProcessPoolExecutor() as executor:
+        for ids, texts, metadatas in executor.map(
+            process_file, files, repeat(data_dir), chunksize=16
+        ):
+            all_ids.extend(ids)
+            all_texts.extend(texts)
+            all_metadatas.extend(metadatas)
+
+    # Scraped pages share boilerplate (sidebars, banners, repeated nav text),
+    # which surfaces as identical chunks across files; keep only the first
+    # occurrence so the same text is never embedded or stored twice.
+    seen_chunks: set = set()
+    unique_ids: List[str] = []
+    unique_texts: List[str] = []
+    unique_metadatas: List[Dict[str, str]] = []
+    for doc_id, text, metadata in zip(all_ids, all_texts, all_metadatas):
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if key in seen_chunks:
             continue
+        seen_chunks.add(key)
+        unique_ids.append(doc_id)
+        unique_texts.append(text)
+        unique_metadatas.append(metadata)
 
-        for idx, chunk in enumerate(chunks):
-            doc_id = f"{rel_path.as_posix()}::chunk-{idx}"
-            metadata = {
-                "source_file": rel_path.as_posix(),
-                "title": title,
-                # Store URL as empty string if unknown to avoid None in Chroma metadata.
-                "url": "",
-            }
-            all_ids.append(doc_id)
-            all_texts.append(chunk)
-            all_metadatas.append(metadata)
+    dropped = len(all_texts) - len(unique_texts)
+    if dropped:
+        print(f"Dropped {dropped} duplicate chunks before embedding.")
+    all_ids, all_texts, all_metadatas = unique_ids, unique_texts, unique_metadatas
 
     if not all_texts:
         print("No text chunks generated. Nothing to ingest.")
@@ -178,22 +417,28 @@ def main():
         f"Storing embeddings in vector DB at '{VECTOR_STORE_DIR}', collection '{UB_COLLECTION_NAME}'."
     )
 
-    batch_size = 64
-    for i in range(0, len(all_texts), batch_size):
-        batch_texts = all_texts[i : i + batch_size]
-        batch_ids = all_ids[i : i + batch_size]
-        batch_metadatas = all_metadatas[i : i + batch_size]
+    batch_ranges = build_batch_ranges(all_texts, provider)
+    batches = [all_texts[start:end] for start, end in batch_ranges]
 
-        try:
-            embeddings = embed_texts(batch_texts)
-        except RuntimeError as exc:
-            if provider == "ollama":
-                print(
-                    "Could not reach Ollama at OLLAMA_BASE_URL. Make sure Ollama is "
-                    "installed, running, and the embedding model is available."
-                )
-                sys.exit(1)
-            raise
+    cache_conn = open_embed_cache()
+    try:
+        batch_embeddings = asyncio.run(embed_batches(batches, provider, cache_conn))
+    except RuntimeError as exc:
+        if provider == "ollama":
+            print(
+                "Could not reach Ollama at OLLAMA_BASE_URL. Make sure Ollama is "
+                "installed, running, and the embedding model is available."
+            )
+            sys.exit(1)
+        raise
+    finally:
+        cache_conn.close()
+
+    for batch_num, ((start, end), batch_texts, embeddings) in enumerate(
+        zip(batch_ranges, batches, batch_embeddings), start=1
+    ):
+        batch_ids = all_ids[start:end]
+        batch_metadatas = all_metadatas[start:end]
 
         if len(embeddings) != len(batch_texts):
             print(
@@ -214,14 +459,22 @@ def main():
             )
             sys.exit(1)
 
+        # Unit-normalize to match the cosine index space. (fp16 storage is
+        # not achievable inside Chroma - it converts embeddings back to
+        # float32 - so the vectors stay full precision.)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        vectors = vectors / norms
+
         collection.add(
             ids=batch_ids,
             documents=batch_texts,
             metadatas=batch_metadatas,
-            embeddings=embeddings,
+            embeddings=vectors.tolist(),
         )
 
-        print(f"Ingested batch {i // batch_size + 1} ({len(batch_texts)} chunks)")
+        print(f"Ingested batch {batch_num} ({len(batch_texts)} chunks)")
 
     print("Ingestion complete. Vector store is ready at:", VECTOR_STORE_DIR)
 
@@ -3,16 +3,16 @@
 Use responsibly and respect robots.txt and the site's terms of use.
 """
 
+import asyncio
 import re
 import sys
-from collections import deque
 from pathlib import Path
-from typing import Set
+from typing import List, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
 from dotenv import load_dotenv
+from selectolax.parser import HTMLParser
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 if str(ROOT_DIR) not in sys.path:
@@ -29,6 +29,7 @@ SEED_URLS = [
 ]
 MAX_PAGES = 15  # enough to grab all faculty tabs/anchors
 MAX_DEPTH = 2   # stay very near the seed page
+CONCURRENT_FETCHES = 8  # in-flight requests; keep modest for politeness
 OUTPUT_DIR = Path(UB_DATA_DIR)
 
 
@@ -40,14 +41,26 @@ def is_allowed_url(url: str) -> bool:
     return any(parsed.netloc.endswith(domain) for domain in ALLOWED_DOMAINS)
 
 
-def clean_text_from_html(html: str) -> str:
-    """Convert HTML to readable plain text."""
-    soup = BeautifulSoup(html, "html.parser")
+def extract_links(tree: HTMLParser, base_url: str) -> List[str]:
+    """Resolve all anchor hrefs in a parsed page against base_url."""
+    links: List[str] = []
+    for node in tree.css("a[href]"):
+        href = node.attributes.get("href")
+        if href:
+            links.append(urljoin(base_url, href))
+    return links
 
-    for tag in soup(["script", "style", "nav", "footer", "header"]):
-        tag.decompose()
 
-    text = soup.get_text(separator="\n")
+def clean_text_from_tree(tree: HTMLParser) -> str:
+    """Convert a parsed HTML tree to readable plain text.
+
+    Mutates the tree (chrome elements are removed), so extract links first.
+    """
+    for node in tree.css("script,style,nav,footer,header"):
+        node.decompose()
+
+    body = tree.body if tree.body is not None else tree.root
+    text = body.text(separator="\n") if body is not None else ""
     lines = [line.strip() for line in text.splitlines()]
     lines = [line for line in lines if line]
     return "\n".join(lines)
@@ -72,53 +85,89 @@ def url_to_filename(url: str) -> str:
     return f"{parsed.netloc}{slug}.txt"
 
 
-def crawl():
-    """Breadth-first crawl starting from SEED_URLS."""
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    depth: int,
+) -> Optional[str]:
+    """Fetch one page, returning its HTML or None on failure."""
+    try:
+        print(f"Fetching [{depth}] {url}")
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+    except Exception as exc:  # pragma: no cover
+        print(f"Failed to fetch {url}: {exc}")
+        return None
+
+
+async def crawl():
+    """Breadth-first crawl starting from SEED_URLS.
+
+    A pool of CONCURRENT_FETCHES worker coroutines shares one crawl queue,
+    so a slow page no longer stalls the whole crawl.
+    """
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     visited: Set[str] = set()
-    queue = deque([(url, 0) for url in SEED_URLS])
+    queue: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+    for url in SEED_URLS:
+        queue.put_nowait((url, 0))
     pages_saved = 0
 
     print("Starting scrape from CSE faculty directory seeds...")
 
-    while queue and pages_saved < MAX_PAGES:
-        url, depth = queue.popleft()
-        if url in visited or depth > MAX_DEPTH:
-            continue
-        visited.add(url)
-
-        if not is_allowed_url(url):
-            continue
-
-        try:
-            print(f"Fetching [{depth}] {url}")
-            resp = requests.get(url, timeout=15)
-            resp.raise_for_status()
-        except Exception as exc:  # pragma: no cover
-            print(f"Failed to fetch {url}: {exc}")
-            continue
-
-        text = clean_text_from_html(resp.text)
-
-        filename = url_to_filename(url)
-        out_path = OUTPUT_DIR / filename
-        with out_path.open("w", encoding="utf-8") as f:
-            f.write(f"# {url}\n\n")
-            f.write(text)
-        print(f"Saved cleaned text to {out_path}")
-
-        pages_saved += 1
-
-        soup = BeautifulSoup(resp.text, "html.parser")
-        for a_tag in soup.find_all("a", href=True):
-            href = a_tag["href"]
-            next_url = urljoin(url, href)
-            if next_url not in visited and is_allowed_url(next_url):
-                queue.append((next_url, depth + 1))
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(
+        headers={"User-Agent": "UB-Bot/0.1"},
+        timeout=timeout,
+    ) as session:
+
+        async def worker() -> None:
+            nonlocal pages_saved
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if pages_saved >= MAX_PAGES or url in visited or depth > MAX_DEPTH:
+                        continue
+                    visited.add(url)
+
+                    if not is_allowed_url(url):
+                        continue
+
+                    html = await fetch_page(session, url, depth)
+                    if html is None or pages_saved >= MAX_PAGES:
+                        continue
+
+                    # Parse once; pull the links out before text extraction
+                    # strips the nav/footer elements they mostly live in.
+                    tree = HTMLParser(html)
+                    links = extract_links(tree, url)
+                    text = clean_text_from_tree(tree)
+
+                    out_path = OUTPUT_DIR / url_to_filename(url)
+                    with out_path.open("w", encoding="utf-8") as f:
+                        f.write(f"# {url}\n\n")
+                        f.write(text)
+                    print(f"Saved cleaned text to {out_path}")
+                    pages_saved += 1
+
+                    for next_url in links:
+                        if next_url not in visited and is_allowed_url(next_url):
+                            queue.put_nowait((next_url, depth + 1))
+                finally:
+                    queue.task_done()
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(CONCURRENT_FETCHES)
+        ]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
     print(f"Crawling complete. Saved {pages_saved} pages to {OUTPUT_DIR}.")
 
 
 if __name__ == "__main__":
-    crawl()
+    asyncio.run(crawl())